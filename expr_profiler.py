@@ -0,0 +1,419 @@
+"""Expression-construction profiler for gurobipy model builders.
+
+Wraps the model-building methods of gp.Model and charges to each call site
+(file, line, method) the Python time and allocations spent building the
+expressions it receives, i.e. everything executed since the previous
+instrumented call, plus the time of the call itself. This makes Python-side
+temporaries (`expr +=` loops, n^2 quicksum, per-element MVar indexing) show
+up on the addConstr/setObjective line that consumes them.
+
+Usage:
+    python expr_profiler.py [--top N] [--temporaries] script.py [script args]
+
+or, inside a script:
+    with BuildProfiler() as profiler:
+        ...  # build the model
+    print(profiler.report())
+"""
+
+import argparse
+import functools
+import linecache
+import os
+import runpy
+import sys
+import time
+import tracemalloc
+
+import gurobipy as gp
+
+# Call sites that are profiled
+INSTRUMENTED_METHODS = (
+    "addVar",
+    "addVars",
+    "addMVar",
+    "addConstr",
+    "addConstrs",
+    "addLConstr",
+    "addQConstr",
+    "addGenConstrIndicator",
+    "setObjective",
+)
+
+# Methods that end the current build segment without being profiled
+# (solve time must not be charged to the next call site)
+BARRIER_METHODS = ("__init__", "update", "optimize", "write")
+
+# Operations that return a new expression (or update one in place)
+ARITHMETIC_METHODS = (
+    "__add__", "__radd__", "__iadd__",
+    "__sub__", "__rsub__", "__isub__",
+    "__mul__", "__rmul__", "__imul__",
+    "__truediv__", "__itruediv__",
+    "__neg__", "__pow__",
+    "__matmul__", "__rmatmul__",
+    "__getitem__",
+)
+
+# gp.LinExpr/gp.QuadExpr are swapped for counting subclasses while
+# temporaries are counted, so keep the original classes
+LinExpr = gp.LinExpr
+QuadExpr = gp.QuadExpr
+
+# Types whose operations can be hooked directly (LinExpr/QuadExpr are
+# immutable extension types, see _CountedLinExpr/_CountedQuadExpr)
+HOOKED_TYPES = tuple(getattr(gp, name) for name in ("Var", "MVar", "MLinExpr", "MQuadExpr") if hasattr(gp, name))
+
+TEMPORARY_TYPES = (LinExpr, QuadExpr) + tuple(
+    getattr(gp, name) for name in ("MLinExpr", "MQuadExpr") if hasattr(gp, name)
+)
+
+EXPRESSION_TYPES = (gp.TempConstr, gp.GenExpr) + TEMPORARY_TYPES
+
+# Profiler counting temporaries, if any
+_active_profiler = None
+
+
+def _record_temporary(result):
+    """Count an expression produced by an arithmetic operation.
+
+    Plain LinExpr/QuadExpr results are copied into counting subclasses so
+    that the operations applied to them later are counted as well.
+    """
+    if _active_profiler is None or not isinstance(result, TEMPORARY_TYPES):
+        return result
+    if type(result) is LinExpr:
+        result = _CountedLinExpr(result)
+    elif type(result) is QuadExpr:
+        result = _CountedQuadExpr(result)
+    _active_profiler._pending_temporaries += 1
+    return result
+
+
+def _counting(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        return _record_temporary(method(*args, **kwargs))
+
+    return wrapper
+
+
+class _CountedLinExpr(LinExpr):
+    """LinExpr whose arithmetic operations are counted."""
+
+
+class _CountedQuadExpr(QuadExpr):
+    """QuadExpr whose arithmetic operations are counted."""
+
+
+for _counted, _base in ((_CountedLinExpr, LinExpr), (_CountedQuadExpr, QuadExpr)):
+    for _name in ARITHMETIC_METHODS:
+        if _name in _base.__dict__:
+            setattr(_counted, _name, _counting(getattr(_base, _name)))
+
+
+def count_terms(obj):
+    """Number of terms in an expression or temporary constraint.
+
+    Matrix expressions count one term per element.
+    """
+    if isinstance(obj, gp.TempConstr):
+        return count_terms(getattr(obj, "_lhs", None)) + count_terms(getattr(obj, "_rhs", None))
+    if isinstance(obj, QuadExpr):
+        return obj.size() + obj.getLinExpr().size()
+    if isinstance(obj, LinExpr):
+        return obj.size()
+    if isinstance(obj, gp.Var):
+        return 1
+    size = getattr(obj, "size", None)
+    if isinstance(size, int):
+        return size
+    return 0
+
+
+def count_items(result):
+    """Number of variables or constraints returned by a model method."""
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        return len(result)
+    size = getattr(result, "size", None)
+    if isinstance(size, int):
+        return size
+    return 1
+
+
+class SiteStats:
+    def __init__(self, filename, lineno, method):
+        self.filename = filename
+        self.lineno = lineno
+        self.method = method
+        self.calls = 0
+        self.build_time = 0.0
+        self.call_time = 0.0
+        self.items = 0
+        self.expressions = 0
+        self.terms = 0
+        self.temporaries = 0
+        self.peak_memory = 0
+        self.memory_delta = 0
+
+    @property
+    def total_time(self):
+        return self.build_time + self.call_time
+
+
+class _CountingGenerator:
+    """Pass-through wrapper counting the constraints yielded to addConstrs.
+
+    Attribute access is forwarded so that gurobipy can still read the
+    generator's frame to name the constraints.
+    """
+
+    def __init__(self, generator, site):
+        self._generator = generator
+        self._site = site
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        constr = next(self._generator)
+        self._site.expressions += 1
+        self._site.terms += count_terms(constr)
+        return constr
+
+    def __getattr__(self, name):
+        return getattr(self._generator, name)
+
+
+class BuildProfiler:
+    """Opt-in instrumentation of gurobipy model construction.
+
+    Args:
+        temporaries (bool): Count the temporary expressions (LinExpr,
+            QuadExpr, MLinExpr, MQuadExpr) created by arithmetic operations
+            and matrix indexing. The arithmetic methods of Var and the matrix
+            types are wrapped, and gp.LinExpr/gp.QuadExpr and the results of
+            gp.quicksum and tupledict.sum/prod are replaced by counting
+            subclasses. Each counted LinExpr/QuadExpr is copied once, which
+            inflates the measured times.
+        trace_memory (bool): Measure with tracemalloc the peak allocations
+            and the signed change of traced memory of each segment (negative
+            when a segment frees objects allocated by earlier ones).
+    """
+
+    def __init__(self, temporaries=False, trace_memory=True):
+        self.temporaries = temporaries
+        self.trace_memory = trace_memory
+        self.sites = {}
+        self._originals = {}
+        self._hooks = []
+        self._depth = 0
+        self._pending_temporaries = 0
+        self._started_tracemalloc = False
+        self._reset_segment()
+
+    # Installation
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    def install(self):
+        if self.temporaries:
+            self._install_temporaries()
+        for name in INSTRUMENTED_METHODS + BARRIER_METHODS:
+            original = getattr(gp.Model, name, None)
+            if original is None:
+                continue
+            self._originals[name] = original
+            if name in INSTRUMENTED_METHODS:
+                setattr(gp.Model, name, self._wrap_site(name, original))
+            else:
+                setattr(gp.Model, name, self._wrap_barrier(original))
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._reset_segment()
+
+    def uninstall(self):
+        if self.temporaries:
+            self._uninstall_temporaries()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        for name, original in self._originals.items():
+            setattr(gp.Model, name, original)
+        self._originals.clear()
+
+    # Segments
+
+    def _reset_segment(self):
+        self._mark = time.perf_counter()
+        self._pending_temporaries = 0
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self._memory_base = tracemalloc.get_traced_memory()[0]
+
+    def _wrap_barrier(self, original):
+        profiler = self
+
+        @functools.wraps(original)
+        def wrapper(model, *args, **kwargs):
+            try:
+                return original(model, *args, **kwargs)
+            finally:
+                if not profiler._depth:
+                    profiler._reset_segment()
+
+        return wrapper
+
+    def _wrap_site(self, method, original):
+        profiler = self
+
+        @functools.wraps(original)
+        def wrapper(model, *args, **kwargs):
+            # Calls made by gurobipy itself belong to the outer call site
+            if profiler._depth:
+                return original(model, *args, **kwargs)
+
+            caller = sys._getframe(1)
+            key = (caller.f_code.co_filename, caller.f_lineno, method)
+            site = profiler.sites.get(key)
+            if site is None:
+                site = profiler.sites[key] = SiteStats(*key)
+
+            for arg in list(args) + list(kwargs.values()):
+                if isinstance(arg, EXPRESSION_TYPES):
+                    site.expressions += 1
+                    site.terms += count_terms(arg)
+            if method == "addConstrs" and args:
+                args = (_CountingGenerator(args[0], site),) + args[1:]
+
+            start = time.perf_counter()
+            profiler._depth += 1
+            try:
+                result = original(model, *args, **kwargs)
+            finally:
+                profiler._depth -= 1
+                end = time.perf_counter()
+                site.calls += 1
+                site.build_time += start - profiler._mark
+                site.call_time += end - start
+                site.temporaries += profiler._pending_temporaries
+                if profiler.trace_memory and tracemalloc.is_tracing():
+                    current, peak = tracemalloc.get_traced_memory()
+                    site.peak_memory = max(site.peak_memory, peak - profiler._memory_base)
+                    site.memory_delta += current - profiler._memory_base
+                profiler._reset_segment()
+
+            site.items += count_items(result)
+            return result
+
+        return wrapper
+
+    # Temporaries
+
+    def _hook(self, owner, name, replacement):
+        self._hooks.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+    def _install_temporaries(self):
+        global _active_profiler
+        if _active_profiler is not None:
+            raise RuntimeError("Another BuildProfiler is already counting temporaries")
+        _active_profiler = self
+
+        for cls in HOOKED_TYPES:
+            for name in ARITHMETIC_METHODS:
+                if name in cls.__dict__:
+                    self._hook(cls, name, _counting(cls.__dict__[name]))
+        # Expressions built by gurobipy helpers become countable
+        self._hook(gp, "quicksum", _counting(gp.quicksum))
+        self._hook(gp.tupledict, "sum", _counting(gp.tupledict.sum))
+        self._hook(gp.tupledict, "prod", _counting(gp.tupledict.prod))
+        # Explicit accumulators, e.g. obj = gp.QuadExpr(); obj += ...
+        self._hook(gp, "LinExpr", _CountedLinExpr)
+        self._hook(gp, "QuadExpr", _CountedQuadExpr)
+
+    def _uninstall_temporaries(self):
+        global _active_profiler
+        for owner, name, original in reversed(self._hooks):
+            setattr(owner, name, original)
+        self._hooks.clear()
+        _active_profiler = None
+
+    # Report
+
+    def report(self, top=20):
+        """Hot-spot report, call sites ranked by total time."""
+        sites = sorted(self.sites.values(), key=lambda s: s.total_time, reverse=True)
+        total = sum(s.total_time for s in sites)
+
+        header = (
+            f"{'rank':>4} {'total(s)':>9} {'%':>5} {'build(s)':>9} {'call(s)':>9} {'calls':>6} "
+            f"{'items':>7} {'exprs':>7} {'terms':>8} {'temps':>8} {'peak(KiB)':>10} {'delta(KiB)':>10}  site"
+        )
+        lines = [
+            f"Model construction: {total:.4f} s over {sum(s.calls for s in sites)} calls "
+            f"at {len(sites)} call sites",
+            header,
+            "-" * len(header),
+        ]
+        for rank, site in enumerate(sites[:top], start=1):
+            share = 100 * site.total_time / total if total > 0 else 0.0
+            temps = f"{site.temporaries:>8}" if self.temporaries else f"{'-':>8}"
+            peak = f"{site.peak_memory / 1024:>10.1f}" if self.trace_memory else f"{'-':>10}"
+            delta = f"{site.memory_delta / 1024:>10.1f}" if self.trace_memory else f"{'-':>10}"
+            lines.append(
+                f"{rank:>4} {site.total_time:>9.4f} {share:>5.1f} {site.build_time:>9.4f} "
+                f"{site.call_time:>9.4f} {site.calls:>6} {site.items:>7} {site.expressions:>7} "
+                f"{site.terms:>8} {temps} {peak} {delta}  "
+                f"{os.path.basename(site.filename)}:{site.lineno} {site.method}"
+            )
+            source = linecache.getline(site.filename, site.lineno).strip()
+            if source:
+                lines.append(f"{'':>5}{source}")
+        if self.trace_memory:
+            lines.append("delta: signed change of traced memory, negative when earlier allocations are freed.")
+        if self.temporaries:
+            lines.append("Times include the overhead of counting temporaries (--temporaries).")
+        return "\n".join(lines)
+
+
+def profile_script(profiler, path, argv=()):
+    """Run a script as __main__ under the given profiler."""
+    saved_argv = sys.argv
+    sys.argv = [path, *argv]
+    try:
+        with profiler:
+            runpy.run_path(path, run_name="__main__")
+    finally:
+        sys.argv = saved_argv
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile gurobipy model construction of a script.")
+    parser.add_argument("script", help="script to profile")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments passed to the script")
+    parser.add_argument("--top", type=int, default=20, help="number of call sites to report")
+    parser.add_argument(
+        "--temporaries",
+        action="store_true",
+        help="count temporary expressions (slows the build down)",
+    )
+    parser.add_argument("--no-memory", action="store_true", help="do not trace allocations")
+    options = parser.parse_args()
+
+    profiler = BuildProfiler(temporaries=options.temporaries, trace_memory=not options.no_memory)
+    # The report is printed even if the script fails after building its model
+    try:
+        profile_script(profiler, options.script, options.args)
+    finally:
+        print()
+        print(profiler.report(top=options.top))
@@ -0,0 +1,276 @@
+"""Presolve-and-reduce pipeline for repeated solves of the same MPS model.
+
+Presolve runs once on the original model. The reduced model is written next
+to it together with a JSON mapping from reduced to original variables, and is
+reused by later runs (e.g. with different callback or stopping settings)
+as long as the original file and presolve settings are unchanged. Solutions
+of the reduced model are lifted back to the original variables.
+
+Usage:
+    python presolve_pipeline.py [--model data/mkp.mps/mkp.mps] [--time-from-best 2 5 10]
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from functools import partial
+
+import gurobipy as gp
+from gurobipy import GRB
+
+from callback import CallbackData, callback
+
+CACHE_VERSION = 1
+
+
+def reduced_paths(model_path):
+    """Paths of the persisted reduced model and of its mapping."""
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.presolved.mps", f"{root}.presolved.json"
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def presolve_and_persist(model_path, env=None, presolve_level=-1):
+    """Presolve the model once and persist the reduced model and its mapping.
+
+    Args:
+        model_path (str): Original model file.
+        env (gp.Env): Environment used to read the models.
+        presolve_level (int): Value of the Presolve parameter.
+
+    Returns:
+        dict: Mapping metadata ("source_sha256", "presolve_time",
+        "reduced_to_original", ...). A valid persisted reduction is reused
+        without presolving again.
+    """
+    reduced_path, mapping_path = reduced_paths(model_path)
+    digest = file_digest(model_path)
+
+    if os.path.exists(reduced_path) and os.path.exists(mapping_path):
+        with open(mapping_path) as f:
+            mapping = json.load(f)
+        if (
+            mapping.get("version") == CACHE_VERSION
+            and mapping.get("source_sha256") == digest
+            and mapping.get("presolve_level") == presolve_level
+        ):
+            return mapping
+
+    with gp.read(model_path, env=env) as original:
+        original.Params.Presolve = presolve_level
+        start = time.perf_counter()
+        reduced = original.presolve()
+        presolve_time = time.perf_counter() - start
+
+        # Presolved variables keep the names of the original ones
+        original_index = {v.VarName: i for i, v in enumerate(original.getVars())}
+        mapping = {
+            "version": CACHE_VERSION,
+            "source": os.path.abspath(model_path),
+            "source_sha256": digest,
+            "presolve_level": presolve_level,
+            "presolve_time": presolve_time,
+            "original_vars": original.NumVars,
+            "original_constrs": original.NumConstrs,
+            "reduced_vars": reduced.NumVars,
+            "reduced_constrs": reduced.NumConstrs,
+            # Stored explicitly, MPS files do not always round-trip them
+            "obj_con": reduced.ObjCon,
+            "model_sense": reduced.ModelSense,
+            "reduced_to_original": [original_index.get(v.VarName) for v in reduced.getVars()],
+        }
+        reduced.write(reduced_path)
+        reduced.dispose()
+
+    with open(mapping_path, "w") as f:
+        json.dump(mapping, f)
+    return mapping
+
+
+def read_reduced(model_path, mapping, env=None):
+    """Read the persisted reduced model."""
+    reduced_path, _ = reduced_paths(model_path)
+    reduced = gp.read(reduced_path, env=env)
+    reduced.ObjCon = mapping["obj_con"]
+    reduced.ModelSense = mapping["model_sense"]
+    return reduced
+
+
+def lift_solution(model_path, mapping, reduced_values, env=None):
+    """Lift a solution of the reduced model to the original variables.
+
+    Variables kept by presolve are fixed to their reduced values and the
+    original model is re-solved to recover the eliminated ones. If this
+    fails (presolve transformed some variables), the values are only used
+    as a MIP start and the returned solution is not the reduced one.
+
+    Returns:
+        tuple: Values of the original variables (None if no solution was
+        found), objective value in the original model and the path used:
+        "fixed" (lifted solution), "start" (solution found from a MIP start,
+        not a lift) or "failed".
+    """
+    with gp.read(model_path, env=env) as original:
+        original.Params.OutputFlag = 0
+        variables = original.getVars()
+        bounds = [(v.LB, v.UB) for v in variables]
+
+        for index, value in zip(mapping["reduced_to_original"], reduced_values):
+            if index is None:
+                continue
+            var = variables[index]
+            if var.VType != GRB.CONTINUOUS:
+                value = round(value)
+            var.LB = var.UB = min(max(value, var.LB), var.UB)
+        original.optimize()
+
+        if original.SolCount > 0:
+            return original.getAttr("X", variables), original.ObjVal, "fixed"
+
+        for var, (lb, ub) in zip(variables, bounds):
+            var.LB, var.UB = lb, ub
+        for index, value in zip(mapping["reduced_to_original"], reduced_values):
+            if index is not None:
+                variables[index].Start = value
+        original.Params.SolutionLimit = 1
+        original.optimize()
+
+        if original.SolCount == 0:
+            return None, None, "failed"
+        return original.getAttr("X", variables), original.ObjVal, "start"
+
+
+def solve_with_callback(model, time_from_best, epsilon_to_compare_gap, time_limit):
+    """Optimize a model under the gap-stall stopping rule of callback.py."""
+    model.Params.OutputFlag = 0
+    model.Params.TimeLimit = time_limit
+    callback_data = CallbackData(time_from_best, epsilon_to_compare_gap, verbose=False)
+    model.optimize(partial(callback, cbdata=callback_data))
+
+
+def run_original(model_path, time_from_best, epsilon_to_compare_gap, time_limit, env=None):
+    """One run on the original model, presolve included."""
+    start = time.perf_counter()
+    with gp.read(model_path, env=env) as model:
+        solve_with_callback(model, time_from_best, epsilon_to_compare_gap, time_limit)
+        objective = model.ObjVal if model.SolCount > 0 else None
+    return {"time": time.perf_counter() - start, "objective": objective}
+
+
+def run_reduced(model_path, mapping, time_from_best, epsilon_to_compare_gap, time_limit,
+                env=None, presolve_level=0):
+    """One run on the persisted reduced model, lifting included."""
+    start = time.perf_counter()
+    with read_reduced(model_path, mapping, env=env) as reduced:
+        # The model is already presolved
+        reduced.Params.Presolve = presolve_level
+        solve_with_callback(reduced, time_from_best, epsilon_to_compare_gap, time_limit)
+        if reduced.SolCount == 0:
+            return {
+                "time": time.perf_counter() - start,
+                "objective": None,
+                "lifted": None,
+                "lift": "failed",
+            }
+        reduced_objective = reduced.ObjVal
+        reduced_values = reduced.getAttr("X", reduced.getVars())
+
+    _, lifted_objective, lift = lift_solution(model_path, mapping, reduced_values, env=env)
+    return {
+        "time": time.perf_counter() - start,
+        "objective": reduced_objective,
+        # Only a fixed-variable lift is the reduced solution in the original space
+        "lifted": lifted_objective if lift == "fixed" else None,
+        "lift": lift,
+    }
+
+
+def parameter_sweep(model_path, times_from_best, epsilons, time_limit=60, env=None):
+    """Compare original and reduced runs over a sweep of callback settings."""
+    start = time.perf_counter()
+    mapping = presolve_and_persist(model_path, env=env)
+    preparation_time = time.perf_counter() - start
+
+    results = []
+    for time_from_best, epsilon in itertools.product(times_from_best, epsilons):
+        original = run_original(model_path, time_from_best, epsilon, time_limit, env=env)
+        reduced = run_reduced(model_path, mapping, time_from_best, epsilon, time_limit, env=env)
+        results.append({
+            "time_from_best": time_from_best,
+            "epsilon": epsilon,
+            "original": original,
+            "reduced": reduced,
+        })
+    return mapping, preparation_time, results
+
+
+def format_report(mapping, preparation_time, results):
+    lines = [
+        f"Original model: {mapping['original_vars']} vars, {mapping['original_constrs']} constrs",
+        f"Reduced model:  {mapping['reduced_vars']} vars, {mapping['reduced_constrs']} constrs",
+        f"Presolve (once): {mapping['presolve_time']:.3f} s, "
+        f"preparation this session: {preparation_time:.3f} s",
+        "",
+        f"{'time_from_best':>14} {'epsilon':>9} {'original(s)':>12} {'reduced(s)':>11} "
+        f"{'saved(s)':>9} {'original obj':>14} {'lifted obj':>14} {'lift':>6}",
+    ]
+
+    def objective(value):
+        return f"{value:>14.4f}" if value is not None else f"{'-':>14}"
+
+    total_saved = 0.0
+    for result in results:
+        saved = result["original"]["time"] - result["reduced"]["time"]
+        total_saved += saved
+        lines.append(
+            f"{result['time_from_best']:>14} {result['epsilon']:>9.0e} "
+            f"{result['original']['time']:>12.3f} {result['reduced']['time']:>11.3f} "
+            f"{saved:>9.3f} {objective(result['original']['objective'])} "
+            f"{objective(result['reduced']['lifted'])} {result['reduced']['lift']:>6}"
+        )
+
+    not_lifted = sum(result["reduced"]["lift"] != "fixed" for result in results)
+    if not_lifted:
+        lines.append(
+            f"{not_lifted} reduced solution(s) could not be lifted by fixing the kept "
+            "variables; no lifted objective is reported for them"
+        )
+
+    if results:
+        mean_saved = total_saved / len(results)
+        lines.append("")
+        lines.append(f"Mean time saved per run: {mean_saved:.3f} s")
+        if mean_saved > 0:
+            lines.append(
+                f"Presolve cost recovered after {mapping['presolve_time'] / mean_saved:.1f} runs"
+            )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Presolve once, reuse the reduced model.")
+    parser.add_argument("--model", default="data/mkp.mps/mkp.mps")
+    parser.add_argument("--time-from-best", type=float, nargs="+", default=[2, 5])
+    parser.add_argument("--epsilon", type=float, nargs="+", default=[1e-4, 1e-3])
+    parser.add_argument("--time-limit", type=float, default=60)
+    options = parser.parse_args()
+
+    with gp.Env(params={"OutputFlag": 0}) as env:
+        report = format_report(*parameter_sweep(
+            options.model,
+            options.time_from_best,
+            options.epsilon,
+            time_limit=options.time_limit,
+            env=env,
+        ))
+    print(report)
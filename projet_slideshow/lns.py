@@ -0,0 +1,387 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import gurobipy as gp
+from gurobipy import GRB
+
+from slideshow import lire_fichier_entree
+
+# Tableaux partagés, attachés une seule fois par processus de travail
+_shm_workers = []
+_tableaux_workers = {}
+_env_worker = None
+
+
+def encoder_photos(photos):
+    """
+    Encode les photos sous forme de tableaux numpy compacts (format CSR).
+
+    Args:
+        photos (list): Liste de dictionnaires contenant les informations des photos.
+
+    Returns:
+        dict: Tableaux 'tag_ptr', 'tag_ids' et 'vertical'. Les tags de la photo p
+        sont tag_ids[tag_ptr[p]:tag_ptr[p + 1]].
+    """
+    ids_tags = {}
+    tag_ptr = np.zeros(len(photos) + 1, dtype=np.int64)
+    tag_ids = []
+    for p, photo in enumerate(photos):
+        ids = sorted({ids_tags.setdefault(tag, len(ids_tags)) for tag in photo['tags']})
+        tag_ids.extend(ids)
+        tag_ptr[p + 1] = len(tag_ids)
+
+    return {
+        'tag_ptr': tag_ptr,
+        'tag_ids': np.array(tag_ids, dtype=np.int32),
+        'vertical': np.array([p['orientation'] == 'V' for p in photos], dtype=np.uint8),
+    }
+
+
+def partager_tableaux(tableaux):
+    """
+    Copie les tableaux dans des segments de mémoire partagée.
+
+    Args:
+        tableaux (dict): Tableaux numpy à partager, indexés par nom.
+
+    Returns:
+        tuple: Liste des segments créés (à libérer par l'appelant) et
+        descripteurs (nom du segment, forme, dtype) à transmettre aux processus.
+    """
+    segments = []
+    descripteurs = {}
+    for nom, tableau in tableaux.items():
+        # Un segment de taille nulle n'est pas autorisé
+        shm = shared_memory.SharedMemory(create=True, size=max(tableau.nbytes, 1))
+        vue = np.ndarray(tableau.shape, dtype=tableau.dtype, buffer=shm.buf)
+        vue[:] = tableau
+        segments.append(shm)
+        descripteurs[nom] = (shm.name, tableau.shape, tableau.dtype.str)
+    return segments, descripteurs
+
+
+def _initialiser_worker(descripteurs):
+    """
+    Attache les tableaux partagés et crée l'environnement Gurobi du processus.
+    """
+    global _env_worker
+    for nom, (nom_shm, forme, dtype) in descripteurs.items():
+        shm = shared_memory.SharedMemory(name=nom_shm)
+        _shm_workers.append(shm)
+        _tableaux_workers[nom] = np.ndarray(forme, dtype=np.dtype(dtype), buffer=shm.buf)
+
+    _env_worker = gp.Env(params={"OutputFlag": 0, "Threads": 1})
+
+
+def tags_slide(slide, tableaux):
+    """
+    Retourne l'ensemble des identifiants de tags d'une slide (une ou deux photos).
+    """
+    tag_ptr, tag_ids = tableaux['tag_ptr'], tableaux['tag_ids']
+    tags = set()
+    for p in slide:
+        tags.update(tag_ids[tag_ptr[p]:tag_ptr[p + 1]].tolist())
+    return tags
+
+
+def score_transition(tags1, tags2):
+    """
+    Score d'enchaînement entre deux slides : min(communs, propres à 1, propres à 2).
+    """
+    communs = len(tags1 & tags2)
+    return min(communs, len(tags1) - communs, len(tags2) - communs)
+
+
+def score_diaporama(slides, tableaux):
+    """
+    Calcule le score total d'un diaporama.
+
+    Args:
+        slides (list): Ordre des slides, chaque slide étant un tuple d'indices de photos.
+        tableaux (dict): Tableaux produits par encoder_photos.
+
+    Returns:
+        int: Somme des scores d'enchaînement.
+    """
+    tags = [tags_slide(s, tableaux) for s in slides]
+    return sum(score_transition(tags[i], tags[i + 1]) for i in range(len(tags) - 1))
+
+
+def slides_initiales(photos):
+    """
+    Construit un diaporama valide : une slide par photo horizontale, puis les
+    photos verticales regroupées deux par deux dans l'ordre du fichier.
+
+    Args:
+        photos (list): Liste de dictionnaires contenant les informations des photos.
+
+    Returns:
+        list: Ordre des slides.
+    """
+    horizontal_photos = [i for i, p in enumerate(photos) if p['orientation'] == 'H']
+    vertical_photos = [i for i, p in enumerate(photos) if p['orientation'] == 'V']
+    slides = [(p,) for p in horizontal_photos]
+    slides += [tuple(vertical_photos[i:i + 2]) for i in range(0, len(vertical_photos) - 1, 2)]
+    return slides
+
+
+def choisir_fenetres(slides, tableaux, taille_fenetre, nb_fenetres, strategie, rng):
+    """
+    Choisit des fenêtres de slides consécutives deux à deux disjointes.
+
+    Deux fenêtres sont séparées par au moins une slide : les voisines fixes
+    d'une fenêtre ne sont donc jamais modifiées par une autre fenêtre.
+
+    Args:
+        slides (list): Ordre courant des slides.
+        tableaux (dict): Tableaux produits par encoder_photos.
+        taille_fenetre (int): Nombre de slides par fenêtre.
+        nb_fenetres (int): Nombre maximal de fenêtres.
+        strategie (str): 'aleatoire' ou 'faible' (fenêtres centrées sur les
+            enchaînements de plus faible score).
+        rng (random.Random): Générateur aléatoire.
+
+    Returns:
+        list: Fenêtres sous forme de couples (début, fin) avec fin exclue.
+    """
+    n_slides = len(slides)
+    taille_fenetre = min(taille_fenetre, n_slides)
+    debuts_possibles = range(n_slides - taille_fenetre + 1)
+
+    if strategie == 'faible':
+        tags = [tags_slide(s, tableaux) for s in slides]
+        scores = [score_transition(tags[i], tags[i + 1]) for i in range(n_slides - 1)]
+        # Les ex aequo sont départagés au hasard pour varier les voisinages
+        transitions = sorted(range(n_slides - 1), key=lambda i: (scores[i], rng.random()))
+        candidats = [
+            min(max(i + 1 - taille_fenetre // 2, 0), n_slides - taille_fenetre)
+            for i in transitions
+        ]
+    elif strategie == 'aleatoire':
+        candidats = rng.sample(debuts_possibles, len(debuts_possibles))
+    else:
+        raise ValueError(f"Stratégie inconnue : {strategie}")
+
+    fenetres = []
+    for debut in candidats:
+        fin = debut + taille_fenetre
+        if all(fin < d or debut > f for d, f in fenetres):
+            fenetres.append((debut, fin))
+            if len(fenetres) == nb_fenetres:
+                break
+    return sorted(fenetres)
+
+
+def reoptimiser_fenetre(fenetre, gauche, droite, tableaux=None, env=None, limite_temps=None):
+    """
+    Réordonne exactement les slides d'une fenêtre entre deux voisines fixes.
+
+    Le sous-problème est un plus long chemin hamiltonien d'une source vers un
+    puits, les sous-tours étant éliminés par les contraintes MTZ.
+
+    Args:
+        fenetre (list): Slides de la fenêtre, dans l'ordre courant.
+        gauche (tuple): Slide fixe précédant la fenêtre, ou None.
+        droite (tuple): Slide fixe suivant la fenêtre, ou None.
+        tableaux (dict): Tableaux produits par encoder_photos (par défaut, ceux
+            du processus de travail).
+        env (gp.Env): Environnement Gurobi (par défaut, celui du processus de travail).
+        limite_temps (float): Limite de temps du sous-modèle en secondes (aucune par défaut).
+
+    Returns:
+        tuple: Nouvel ordre de la fenêtre et gain de score (0 si aucune amélioration).
+    """
+    if tableaux is None:
+        tableaux = _tableaux_workers
+    if env is None:
+        env = _env_worker
+
+    k = len(fenetre)
+    tags = [tags_slide(s, tableaux) for s in fenetre]
+    tags_gauche = tags_slide(gauche, tableaux) if gauche is not None else None
+    tags_droite = tags_slide(droite, tableaux) if droite is not None else None
+
+    def score_ordre(ordre):
+        total = sum(score_transition(tags[u], tags[v]) for u, v in zip(ordre, ordre[1:]))
+        if tags_gauche is not None:
+            total += score_transition(tags_gauche, tags[ordre[0]])
+        if tags_droite is not None:
+            total += score_transition(tags[ordre[-1]], tags_droite)
+        return total
+
+    ordre_courant = list(range(k))
+    score_courant = score_ordre(ordre_courant)
+    if k < 2:
+        return fenetre, 0
+
+    # Noeuds 0..k-1 : slides de la fenêtre, k : source, k + 1 : puits
+    source, puits = k, k + 1
+    poids = {}
+    for u in range(k):
+        for v in range(k):
+            if u != v:
+                poids[u, v] = score_transition(tags[u], tags[v])
+        poids[source, u] = score_transition(tags_gauche, tags[u]) if tags_gauche is not None else 0
+        poids[u, puits] = score_transition(tags[u], tags_droite) if tags_droite is not None else 0
+
+    with gp.Model("Fenetre", env=env) as model:
+        if limite_temps is not None:
+            model.Params.TimeLimit = limite_temps
+        x = model.addVars(poids.keys(), vtype=GRB.BINARY, name="x")
+        rang = model.addVars(k, lb=1, ub=k, name="rang")
+
+        model.addConstr(x.sum(source, '*') == 1, name="depart")
+        model.addConstr(x.sum('*', puits) == 1, name="arrivee")
+        model.addConstrs((x.sum(u, '*') == 1 for u in range(k)), name="sortie")
+        model.addConstrs((x.sum('*', u) == 1 for u in range(k)), name="entree")
+
+        # Élimination des sous-tours (Miller-Tucker-Zemlin)
+        model.addConstrs(
+            (rang[v] >= rang[u] + 1 - k * (1 - x[u, v]) for u in range(k) for v in range(k) if u != v),
+            name="mtz",
+        )
+
+        model.setObjective(x.prod(poids), GRB.MAXIMIZE)
+
+        # L'ordre courant sert de solution de départ
+        for var in x.values():
+            var.Start = 0
+        x[source, 0].Start = 1
+        x[k - 1, puits].Start = 1
+        for u in range(k - 1):
+            x[u, u + 1].Start = 1
+
+        model.optimize()
+
+        if model.SolCount == 0:
+            return fenetre, 0
+
+        successeur = {u: v for (u, v), var in x.items() if var.X > 0.5}
+
+    ordre = []
+    u = successeur[source]
+    while u != puits:
+        ordre.append(u)
+        u = successeur[u]
+
+    gain = score_ordre(ordre) - score_courant
+    if gain <= 0:
+        return fenetre, 0
+    return [fenetre[u] for u in ordre], gain
+
+
+def _reoptimiser_tache(tache):
+    debut, fenetre, gauche, droite, limite_temps = tache
+    nouvel_ordre, gain = reoptimiser_fenetre(fenetre, gauche, droite, limite_temps=limite_temps)
+    return debut, nouvel_ordre, gain
+
+
+def lns_slideshow(photos, slides=None, budget_temps=60.0, taille_fenetre=8,
+                  nb_processus=None, strategie='faible', limite_sous_modele=10.0, graine=0):
+    """
+    Améliore un diaporama par recherche à grand voisinage (LNS) parallèle.
+
+    À chaque itération, des fenêtres disjointes de slides consécutives sont
+    réoptimisées exactement par de petits modèles Gurobi, en parallèle dans un
+    pool de processus. Les tableaux de photos et de tags sont partagés via la
+    mémoire partagée plutôt que sérialisés à chaque tâche.
+
+    Args:
+        photos (list): Liste de dictionnaires contenant les informations des photos.
+        slides (list): Ordre initial des slides (par défaut, slides_initiales).
+        budget_temps (float): Budget de temps total en secondes.
+        taille_fenetre (int): Nombre de slides réoptimisées par fenêtre.
+        nb_processus (int): Nombre de processus de travail (par défaut, nombre de CPU).
+        strategie (str): Choix des fenêtres, 'faible' ou 'aleatoire'.
+        limite_sous_modele (float): Limite de temps de chaque sous-modèle en secondes,
+            ramenée au temps restant du budget.
+        graine (int): Graine du générateur aléatoire.
+
+    Returns:
+        tuple: Ordre des slides amélioré et historique des itérations (liste de
+        dictionnaires 'temps', 'score', 'gain' et 'gain_par_seconde').
+    """
+    debut_lns = time.perf_counter()
+    rng = random.Random(graine)
+
+    if slides is None:
+        slides = slides_initiales(photos)
+    slides = [tuple(s) for s in slides]
+
+    tableaux = encoder_photos(photos)
+    score = score_diaporama(slides, tableaux)
+    historique = [{'temps': 0.0, 'score': score, 'gain': 0, 'gain_par_seconde': 0.0}]
+    if len(slides) < 2:
+        return slides, historique
+
+    nb_processus = nb_processus or os.cpu_count() or 1
+    segments, descripteurs = partager_tableaux(tableaux)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=nb_processus,
+            initializer=_initialiser_worker,
+            initargs=(descripteurs,),
+        ) as pool:
+            iterations_sans_gain = 0
+
+            while time.perf_counter() - debut_lns < budget_temps:
+                debut_iteration = time.perf_counter()
+                # Les sous-modèles ne doivent pas dépasser le budget restant
+                limite_temps = min(limite_sous_modele, budget_temps - (debut_iteration - debut_lns))
+
+                # Après une itération sans gain, on diversifie le voisinage
+                strategie_iteration = strategie if iterations_sans_gain == 0 else 'aleatoire'
+                fenetres = choisir_fenetres(
+                    slides, tableaux, taille_fenetre, nb_processus, strategie_iteration, rng
+                )
+                taches = [
+                    (
+                        d,
+                        slides[d:f],
+                        slides[d - 1] if d > 0 else None,
+                        slides[f] if f < len(slides) else None,
+                        limite_temps,
+                    )
+                    for d, f in fenetres
+                ]
+
+                gain = 0
+                for d, nouvel_ordre, gain_fenetre in pool.map(_reoptimiser_tache, taches):
+                    if gain_fenetre > 0:
+                        slides[d:d + len(nouvel_ordre)] = nouvel_ordre
+                        gain += gain_fenetre
+
+                score += gain
+                iterations_sans_gain = 0 if gain > 0 else iterations_sans_gain + 1
+                duree_iteration = time.perf_counter() - debut_iteration
+                historique.append({
+                    'temps': time.perf_counter() - debut_lns,
+                    'score': score,
+                    'gain': gain,
+                    'gain_par_seconde': gain / duree_iteration if duree_iteration > 0 else 0.0,
+                })
+
+                # Une fenêtre couvrant tout le diaporama est déjà optimale
+                if taille_fenetre >= len(slides) and iterations_sans_gain > 0:
+                    break
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+    return slides, historique
+
+
+if __name__ == "__main__":
+    photos = lire_fichier_entree("projet_slideshow/a_example.txt")
+    slides, historique = lns_slideshow(photos, budget_temps=10.0, taille_fenetre=4)
+    duree = historique[-1]['temps']
+    gain_total = historique[-1]['score'] - historique[0]['score']
+    print("Ordre des slides :", slides)
+    print(f"Score : {historique[0]['score']} -> {historique[-1]['score']} "
+          f"({gain_total / duree if duree > 0 else 0.0:.2f} points/s sur {duree:.2f} s)")
@@ -27,7 +27,7 @@ def lire_fichier_entree(chemin_fichier):
             # Extraire les informations
             orientation = elements[0]  # H ou V
             nombre_tags = int(elements[1])  # Nombre de tags
-            tags = elements[nombre_tags:]  # Liste de tags
+            tags = elements[2:2 + nombre_tags]  # Liste de tags
             
             
             # Ajouter la photo à la liste
@@ -110,6 +110,7 @@ def solve_slideshow(photos):
 
 
 
-photos=lire_fichier_entree("projet_slideshow/a_example.txt")
-slides = solve_slideshow(photos)
-print("Ordre des slides :", slides)
\ No newline at end of file
+if __name__ == "__main__":
+    photos=lire_fichier_entree("projet_slideshow/a_example.txt")
+    slides = solve_slideshow(photos)
+    print("Ordre des slides :", slides)
\ No newline at end of file
@@ -0,0 +1,48 @@
+import gurobipy as gp
+import pytest
+
+from expr_profiler import BuildProfiler
+
+
+@pytest.fixture
+def model():
+    with gp.Env(params={"OutputFlag": 0}) as env, gp.Model(env=env) as model:
+        yield model
+
+
+def site_for(profiler, method):
+    (site,) = [s for s in profiler.sites.values() if s.method == method]
+    return site
+
+
+def test_counts_temporaries_of_accumulation_loop(model):
+    with BuildProfiler(temporaries=True, trace_memory=False) as profiler:
+        x = model.addVars(5)
+        expr = gp.LinExpr()
+        for i in range(5):
+            expr += 2.0 * x[i]
+        model.setObjective(expr)
+
+    # One temporary for 2.0 * x[i], one for the in-place addition
+    assert site_for(profiler, "setObjective").temporaries == 10
+
+
+def test_does_not_count_numeric_operations(model):
+    with BuildProfiler(temporaries=True, trace_memory=False) as profiler:
+        x = model.addVars(5)
+        total = 0
+        for i in range(5):
+            total += i - 1
+        model.addConstr(x[total % 5] <= 1)
+
+    assert site_for(profiler, "addConstr").temporaries == 0
+
+
+def test_restores_gurobipy_after_profiling(model):
+    originals = (gp.LinExpr, gp.QuadExpr, gp.quicksum, gp.Var.__mul__, gp.Model.addConstr)
+    with BuildProfiler(temporaries=True):
+        assert gp.LinExpr is not originals[0]
+    assert (gp.LinExpr, gp.QuadExpr, gp.quicksum, gp.Var.__mul__, gp.Model.addConstr) == originals
+
+    x = model.addVar()
+    assert type(2.0 * x) is gp.LinExpr